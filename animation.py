@@ -0,0 +1,107 @@
+import json
+
+from artifacts import digest, write_artifact
+from datetime import datetime, time, timedelta, timezone
+from PIL import Image, ImageSequence
+from pathlib import Path
+
+PATH = Path(__file__).parent
+
+
+def frame_times(count: int, start: datetime, step: timedelta) -> list[str]:
+    return [f"{start + i * step:%Y-%m-%dT%H:%M:%SZ}" for i in range(count)]
+
+
+def decode_gif(
+        gif_path: Path,
+        quality: int = 80,
+        start: time = time(12),
+        step: timedelta = timedelta(hours=3),
+    ) -> dict:
+    cache_dir = gif_path.parent / "frames"
+    index_file = cache_dir / "index.json"
+    source = digest(gif_path.read_bytes())
+    # Frames and valid times depend on these too, not only on the source
+    settings = {"quality": quality, "start": f"{start:%H:%M}", "step": step.total_seconds()}
+
+    if index_file.exists():
+        index = json.loads(index_file.read_text())
+        if index["source"] == source and index.get("settings") == settings:
+            return index
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # One pass over the GIF, every seek decodes a frame
+    with Image.open(gif_path) as gif:
+        frames, durations = zip(*[
+            (frame.convert("RGB"), frame.info.get("duration", 100))
+            for frame in ImageSequence.Iterator(gif)
+        ])
+    frames, durations = list(frames), list(durations)
+
+    files = [f"frame_{i:03d}.webp" for i in range(len(frames))]
+    [frame.save(cache_dir / file, "WEBP", quality=quality, method=6) for frame, file in zip(frames, files)]
+    frames[0].save(
+        cache_dir / "animation.webp",
+        "WEBP",
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=0,
+        quality=quality,
+        method=6,
+    )
+
+    # Valid times assume the loop starts at `start` UTC of the run day
+    run = datetime.combine(
+        datetime.strptime(gif_path.parent.name, "%Y%m%d"),
+        start,
+        tzinfo=timezone.utc,
+    )
+    index = {
+        "source": source,
+        "settings": settings,
+        "frames": [
+            {"file": file, "duration": duration, "valid_time": valid_time}
+            for file, duration, valid_time
+            in zip(files, durations, frame_times(len(frames), run, step))
+        ],
+    }
+    index_file.write_text(json.dumps(index, indent=4))
+    return index
+
+
+def publish_animation(
+        gif_path: Path,
+        out_dir: Path = PATH / "out",
+        name: str = "dust_forecast",
+        **opts,
+    ) -> dict:
+    index = decode_gif(gif_path, **opts)
+    cache_dir = gif_path.parent / "frames"
+
+    now = f"{datetime.now(timezone.utc):%Y-%m-%dT%H:%M:%SZ}"
+    current = max(
+        [i for i, frame in enumerate(index["frames"]) if frame["valid_time"] <= now],
+        default=0,
+    )
+
+    write_artifact(
+        out_dir / f"{name}.webp",
+        (cache_dir / "animation.webp").read_bytes(),
+        compress=False,
+        hashed=True,
+    )
+    [
+        write_artifact(
+            out_dir / f"{name}-frames" / frame["file"],
+            (cache_dir / frame["file"]).read_bytes(),
+            compress=False,
+        )
+        for frame in index["frames"]
+    ]
+    frames_index = {**index, "current": current}
+    write_artifact(
+        out_dir / f"{name}-frames" / "index.json",
+        json.dumps(frames_index, indent=4).encode(),
+    )
+    return frames_index
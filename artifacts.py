@@ -0,0 +1,89 @@
+import brotli
+import gzip
+import hashlib
+import json
+import os
+
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once at import, flipping the umask later would race other threads creating files
+DEFAULT_MODE = 0o666 & ~read_umask()
+
+
+def atomic_write(path: Path, data: bytes) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Temp files are created 0600, publish with the umask default like a plain open()
+    with NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", delete=False) as f:
+        f.write(data)
+        os.fchmod(f.fileno(), DEFAULT_MODE)
+    os.replace(f.name, path)
+    return path
+
+
+def write_if_changed(path: Path, data: bytes, compress: bool = True) -> bool:
+    siblings = {
+        path.with_name(f"{path.name}.gz"): lambda: gzip.compress(data, 9, mtime=0),
+        path.with_name(f"{path.name}.br"): lambda: brotli.compress(data),
+    } if compress else {}
+
+    if (
+        path.exists()
+        and digest(path.read_bytes()) == digest(data)
+        and all(p.exists() for p in siblings)
+    ):
+        return False
+
+    atomic_write(path, data)
+    [atomic_write(p, encode()) for p, encode in siblings.items()]
+    return True
+
+
+def update_manifest(manifest: Path, name: str, entry: dict) -> bool:
+    content = json.loads(manifest.read_text()) if manifest.exists() else {}
+    if content.get(name) == entry:
+        return False
+    content[name] = entry
+    atomic_write(manifest, json.dumps(content, indent=4, sort_keys=True).encode())
+    return True
+
+
+def write_artifact(
+        path: Path,
+        data: bytes,
+        compress: bool = True,
+        hashed: bool = False,
+        manifest: Path|None = None,
+    ) -> bool:
+    sha = digest(data)
+    published = path
+
+    changed = write_if_changed(path, data, compress)
+
+    if hashed:
+        published = path.with_name(f"{path.stem}.{sha[:12]}{path.suffix}")
+        changed |= write_if_changed(published, data, compress)
+        # Only the current hashed copy of an asset is kept
+        [
+            stale.unlink(missing_ok=True)
+            for stale in path.parent.glob(f"{path.stem}.*{path.suffix}*")
+            if not stale.name.startswith(published.name)
+        ]
+
+    update_manifest(
+        manifest or path.parent / "manifest.json",
+        path.name,
+        {"file": published.name, "sha256": sha, "bytes": len(data)},
+    )
+    return changed
@@ -0,0 +1,94 @@
+import pandas as pd
+
+from datetime import date
+from extract import Area
+from pathlib import Path
+from pull import cleanup_downloads
+from typing import Iterable
+
+PATH = Path(__file__).parent / "data" / "drift"
+KEYS = ["time", "process", "species", "member"]
+
+
+def melt_summary(area: Area) -> pd.DataFrame:
+    df = area.data.copy()
+    df.columns = df.columns.set_names(["species", "member"])
+    return (
+        df.stack(["species", "member"])
+            .rename("value")
+            .reset_index()
+            .assign(process=area.process.value, member=lambda x: x.member.astype(str))
+    )
+
+
+def cache_run(
+        areas: Iterable[Area],
+        run: date,
+        cache_dir: Path = PATH / "runs",
+    ) -> pd.DataFrame:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    summary = pd.concat([melt_summary(area) for area in areas], ignore_index=True)
+    summary.to_pickle(cache_dir / f"{run}.pkl")
+    return summary
+
+
+def load_previous_run(run: date, cache_dir: Path = PATH / "runs") -> tuple[date, pd.DataFrame]|None:
+    previous = sorted(
+        f for f in cache_dir.glob("*.pkl")
+        if date.fromisoformat(f.stem) < run
+    )
+    return (
+        (date.fromisoformat(previous[-1].stem), pd.read_pickle(previous[-1]))
+        if previous else None
+    )
+
+
+def get_drift(
+        current: pd.DataFrame,
+        previous: pd.DataFrame,
+        run: date,
+        previous_run: date,
+    ) -> pd.DataFrame:
+    # Inner join keeps only the valid hours both runs cover
+    return (
+        current.merge(previous, on=KEYS, suffixes=("", "_previous"))
+            .assign(
+                run=pd.Timestamp(run),
+                previous_run=pd.Timestamp(previous_run),
+                drift=lambda x: x.value - x.value_previous,
+            )
+    )
+
+
+def update_drift(
+        areas: Iterable[Area],
+        run: date,
+        cache_dir: Path = PATH,
+    ) -> pd.DataFrame:
+    history_file = cache_dir / "history.pkl"
+    history = pd.read_pickle(history_file) if history_file.exists() else pd.DataFrame()
+
+    if not history.empty and (history.run == pd.Timestamp(run)).any():
+        return history
+
+    current = cache_run(areas, run, cache_dir / "runs")
+    cleanup_downloads(cache_dir / "runs")
+
+    if (previous := load_previous_run(run, cache_dir / "runs")) is None:
+        return history
+
+    history = pd.concat(
+        [history, get_drift(current, previous[1], run, previous[0])],
+        ignore_index=True,
+    )
+    history.to_pickle(history_file)
+    return history
+
+
+if __name__ == "__main__":
+    from extract import process_nc
+    from pull import get_cds_forecast
+    from reference import stations
+
+    forecast = get_cds_forecast()
+    history = update_drift(process_nc(**forecast, slices=[Area(), stations]), forecast.date)
@@ -4,21 +4,23 @@ import plotly.express as px
 import plotly.graph_objects as go
 
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
+def format_df(name: str, df: pd.DataFrame) -> pd.DataFrame:
+    (day_no, date, *_, level) = name.split('_')
+    df['day'] = datetime.strptime(date, "%Y%m%d") + timedelta(days=int(day_no)+1)
+    df['level'] = int(level)
+    df['probability'] = df['value'].astype(int) - 5
+    return df
+
+
 def read_files(
         data_path: Path = Path(__file__).parent.absolute() / "data/AEMET",
         day: date = date.today() - timedelta(days=1),
         join_on_shp: Path = Path(__file__).parent.absolute() / "data/ref/cyprus.geojson",
     ) -> list[pd.DataFrame]:
 
-    def format_df(name: str, df: pd.DataFrame) -> pd.DataFrame:
-        (day_no, date, *_, level) = name.split('_')
-        df['day'] = datetime.strptime(date, "%Y%m%d") + timedelta(days=int(day_no)+1)
-        df['level'] = int(level)
-        df['probability'] = df['value'].astype(int) - 5
-        return df
-
     return [
         format_df(
             name=file.stem,
@@ -32,6 +34,47 @@ def read_files(
     ]
 
 
+@lru_cache(maxsize=8)
+def load_regions(regions_file: Path, name_col: str, mtime_ns: int) -> gp.GeoDataFrame:
+    regions = (
+        gp.read_file(regions_file)[[name_col, "geometry"]]
+            .rename(columns={name_col: "region"})
+    )
+    # Built once here, every sjoin against this polygon set queries it
+    regions.sindex
+    return regions
+
+
+def read_contours(
+        data_path: Path = Path(__file__).parent.absolute() / "data/AEMET",
+        day: date = date.today() - timedelta(days=1),
+    ) -> gp.GeoDataFrame:
+    return pd.concat(
+        [
+            format_df(name=file.stem, df=gp.read_file(file))
+            for file in (data_path / f"{day:%Y%m%d}").glob('*.geojson')
+        ],
+        ignore_index=True,
+    )
+
+
+def get_region_probability_df(
+        regions_file: Path = Path(__file__).parent.absolute() / "data/ref/cyprus.geojson",
+        name_col: str = "Country",
+        data_path: Path = Path(__file__).parent.absolute() / "data/AEMET",
+        day: date = date.today() - timedelta(days=1),
+    ) -> pd.DataFrame:
+    regions = load_regions(regions_file, name_col, regions_file.stat().st_mtime_ns)
+    contours = read_contours(data_path, day).to_crs(regions.crs)
+    return (
+        gp.sjoin(contours, regions, how="inner", predicate="intersects")
+            .groupby(['region', 'day', 'level'])
+            .probability
+            .max()
+            .reset_index()
+    )
+
+
 def get_probability_df(tbls: list[pd.DataFrame]) -> pd.DataFrame:
     return (
         pd.concat(tbls)
@@ -65,8 +108,8 @@ def make_plot(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def get_exceedance_plot() -> go.Figure:
-    tbls = read_files()
+def get_exceedance_plot(day: date = date.today() - timedelta(days=1)) -> go.Figure:
+    tbls = read_files(day=day)
     df = get_probability_df(tbls)
     return make_plot(df)
 
@@ -1,12 +1,15 @@
 from __future__ import annotations
+import netCDF4
+import numpy as np
 import pandas as pd
 import xarray as xr
 import pull
 
 from dataclasses import dataclass, field
-from datetime import date, datetime
+from datetime import date
 from enum import Enum
 from pathlib import Path
+from registry import DatasetRegistry, localize, open_nc
 from typing import Iterator
 
 
@@ -15,6 +18,14 @@ class Process(Enum):
     POINTS = "points"
 
 
+@dataclass()
+class Analysis:
+    area : Area
+    rolling : xr.Dataset
+    daily : xr.Dataset
+    exceedance : pd.DataFrame
+
+
 @dataclass()
 class Area:
     name : str|dict = 'Cyprus'
@@ -41,12 +52,12 @@ class Area:
         )
 
 
-def read_data(nc_file: Path) -> xr.Dataset:
-    return xr.open_dataset(nc_file)
+def read_data(nc_file: Path, registry: DatasetRegistry|None = None) -> xr.Dataset:
+    return registry.open(nc_file) if registry else open_nc(nc_file)
 
 
-def file_complete(nc_file: Path, time_len: int = 97) -> bool:
-    return read_data(nc_file).dropna("time", how="any").time.size == time_len if nc_file.exists() else False
+def file_complete(nc_file: Path, time_len: int = 97, registry: DatasetRegistry|None = None) -> bool:
+    return read_data(nc_file, registry).dropna("time", how="any").time.size == time_len if nc_file.exists() else False
 
 
 def rename_vars(nc: xr.Dataset) -> xr.Dataset:
@@ -62,6 +73,56 @@ def data_selection(data: xr.Dataset, slices: Area) -> xr.Dataset:
     )
 
 
+def nearest_index(coord: np.ndarray, values: np.ndarray) -> np.ndarray:
+    return np.abs(coord[None, :] - values[:, None]).argmin(axis=1)
+
+
+def read_points(nc_file: Path, slices: Area) -> xr.Dataset:
+    def read_var(var: netCDF4.Variable) -> np.ndarray:
+        def hyperslab(i: int, j: int) -> tuple:
+            index = {"level": lev_idx, "latitude": i, "longitude": j}
+            return tuple(index.get(dim, slice(None)) for dim in var.dimensions)
+
+        return np.stack(
+            [np.ma.filled(var[hyperslab(i, j)].astype(float), np.nan) for i, j in cells],
+            axis=-1,
+        )[..., inverse]
+
+    with netCDF4.Dataset(nc_file) as nc:
+        lat = np.ma.filled(nc["latitude"][:])
+        lon = np.ma.filled(nc["longitude"][:])
+        lev = np.ma.filled(nc["level"][:])
+
+        lat_idx = nearest_index(lat, np.atleast_1d(np.asarray(slices.lat, dtype=float)))
+        lon_idx = nearest_index(lon, np.atleast_1d(np.asarray(slices.lon, dtype=float)))
+        lev_idx = int(np.flatnonzero(lev == slices.lev)[0])
+        # Stations sharing a grid cell are read once
+        cells, inverse = np.unique(np.stack([lat_idx, lon_idx], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+
+        time = xr.decode_cf(xr.Dataset(coords={
+            "time": ("time", np.ma.filled(nc["time"][:]), nc["time"].__dict__)
+        }), decode_timedelta=True).time
+
+        return xr.Dataset(
+            {
+                name: (
+                    ("time", Process.POINTS.value),
+                    read_var(var),
+                    {k: var.getncattr(k) for k in ("species", "units") if k in var.ncattrs()},
+                )
+                for name, var in nc.variables.items()
+                if {"time", "latitude", "longitude"} <= set(var.dimensions)
+            },
+            coords={
+                "time": time,
+                "latitude": (Process.POINTS.value, lat[lat_idx]),
+                "longitude": (Process.POINTS.value, lon[lon_idx]),
+                "level": lev[lev_idx],
+            },
+        )
+
+
 def get_quantiles(data: xr.Dataset) -> pd.DataFrame:
     return data.quantile(
         [0, 0.25, 0.5, 0.75, 1],
@@ -78,37 +139,172 @@ def get_summary(data: xr.Dataset, points_name: str|dict) -> pd.DataFrame:
     )
 
 
-def format_date(data: pd.DataFrame, ref_date: date, pivot_on: str) -> pd.DataFrame:
-    def fix_tz(timeseries: pd.Series) -> pd.DatetimeIndex:
-        return pd.DatetimeIndex(
-            pd.to_datetime(timeseries, utc=True)
-        ).tz_convert("Asia/Nicosia")
+def time_axis(
+        data: xr.Dataset,
+        ref_date: date,
+        file: Path|None = None,
+        registry: DatasetRegistry|None = None,
+    ) -> pd.Series:
+    # Lead time -> Nicosia time, localized once per file and looked up by every slice
+    times = registry.time(file, ref_date) if registry else localize(data.time.values, ref_date)
+    return pd.Series(times, index=data.time.values)
 
-    data.time = fix_tz(data.time + datetime.combine(ref_date, datetime.min.time()))
+
+def format_date(data: pd.DataFrame, times: pd.Series, pivot_on: str) -> pd.DataFrame:
+    data.time = data.time.map(times)
     return data.pivot(index="time", columns=pivot_on)
 
 
-def pipeline(data: xr.Dataset, slices: Area, date: date) -> pd.DataFrame:
-    data = data_selection(data, slices)
+def localize_time(data: xr.Dataset, times: pd.Series) -> xr.Dataset:
+    # Naive Nicosia wall-clock time, so daily bins follow local calendar days
+    return data.assign_coords(time=pd.DatetimeIndex(times[data.time.values]).tz_localize(None))
+
+
+def rolling_mean(data: xr.DataArray, window: int = 24) -> xr.DataArray:
+    return data.rolling(time=window, min_periods=window).mean()
+
+
+def daily_mean(data: xr.DataArray, coverage: float = 0.75, step: int = 1) -> xr.DataArray:
+    days = data.resample(time="1D")
+    return days.mean().where(days.count() >= coverage * 24 / step)
+
+
+def exceedance_fraction(
+        data: xr.DataArray,
+        levels: list[int],
+        dims: list[str],
+    ) -> xr.DataArray:
+    thresholds = xr.DataArray(levels, dims="threshold", coords={"threshold": levels})
+    return (data > thresholds).where(data.notnull()).mean(dim=dims)
+
+
+def analyse(
+        data: xr.Dataset,
+        slices: Area,
+        times: pd.Series,
+        levels: list[int] = [50, 100, 200, 500],
+    ) -> Analysis:
+    spatial_dims = {
+        Process.QUANTILE: ["latitude", "longitude"],
+        Process.POINTS: [Process.POINTS.value],
+    }[slices.process]
+
+    cube = localize_time(data_selection(data, slices), times).to_array("species")
+    daily = daily_mean(cube)
+
+    return Analysis(
+        area=slices,
+        rolling=rolling_mean(cube).to_dataset("species"),
+        daily=daily.to_dataset("species"),
+        exceedance=(
+            exceedance_fraction(daily, levels, spatial_dims)
+                .rename("fraction")
+                .to_dataframe()
+                .reset_index()
+                .pivot(index="time", columns=["species", "threshold"], values="fraction")
+        ),
+    )
+
+
+def pipeline(data: xr.Dataset, slices: Area, times: pd.Series) -> pd.DataFrame:
     match slices.process:
         case Process.QUANTILE:
             df = get_quantiles(data)
         case Process.POINTS:
             df = get_summary(data, points_name=slices.name)
-    return format_date(df, date, pivot_on=slices.process.value)
+    return format_date(df, times, pivot_on=slices.process.value)
 
 
 def process_nc(
         file: Path,
         date: date,
         slices: list[Area] = [Area()],
+        registry: DatasetRegistry|None = None,
     ) -> Iterator[Area]:
 
-    data = read_data(file)
+    data = read_data(file, registry)
+    data = rename_vars(data)
+    times = time_axis(data, date, file, registry)
+
+    for slice in slices:
+        selection = (
+            rename_vars(read_points(file, slice))
+            if slice.process == Process.POINTS
+            else data_selection(data, slice)
+        )
+        slice.data = pipeline(selection, slice, times)
+        yield slice
+
+
+def analyse_nc(
+        file: Path,
+        date: date,
+        slices: list[Area] = [Area()],
+        levels: list[int] = [50, 100, 200, 500],
+        registry: DatasetRegistry|None = None,
+    ) -> Iterator[Analysis]:
+
+    data = read_data(file, registry)
     data = rename_vars(data)
+    times = time_axis(data, date, file, registry)
+
+    for slice in slices:
+        yield analyse(data, slice, times, levels)
+
+
+def stack_models(files: dict[str, Path]) -> xr.Dataset:
+    if not files:
+        raise ValueError("No ensemble member to stack")
+    data = [rename_vars(read_data(file)) for file in files.values()]
+    # Not every model provides every species
+    species = sorted(set.intersection(*(set(d.data_vars) for d in data)))
+    return xr.concat(
+        [d[species] for d in data],
+        dim=pd.Index(list(files), name="model"),
+        join="inner",
+    )
+
+
+def ensemble_stats(stack: xr.Dataset, levels: list[int] = [50, 100, 200, 500]) -> xr.Dataset:
+    cube = stack.to_array("species")
+    return xr.Dataset({
+        "mean": cube.mean("model"),
+        "spread": cube.std("model"),
+        "exceedance": exceedance_fraction(cube, levels, ["model"]),
+    })
+
+
+def process_ensemble(
+        forecasts: dict[str, pull.ForecastFile],
+        slices: list[Area] = [Area()],
+        statistic: str = "mean",
+        threshold: int|None = None,
+    ) -> Iterator[Area]:
+
+    if statistic not in ("mean", "spread", "exceedance"):
+        raise ValueError(f"Unknown ensemble statistic: {statistic}")
+    # The views take one value per species, exceedance needs a single threshold
+    if (statistic == "exceedance") != (threshold is not None):
+        raise ValueError("A threshold is required for, and only for, statistic='exceedance'")
+
+    # get_cds_models skips failed members, all of them may have failed
+    if not forecasts:
+        raise ValueError("No ensemble member is available")
+
+    # Only members that reached the newest run can be stacked
+    date = max(f.date for f in forecasts.values())
+    stats = ensemble_stats(
+        stack_models({m: f.file for m, f in forecasts.items() if f.date == date}),
+        levels=[threshold] if threshold is not None else [50, 100, 200, 500],
+    )
+    data = stats[statistic]
+    if threshold is not None:
+        data = data.sel(threshold=threshold, drop=True)
+    data = data.to_dataset("species")
+    times = time_axis(data, date)
 
     for slice in slices:
-        slice.data = pipeline(data, slice, date)
+        slice.data = pipeline(data_selection(data, slice), slice, times)
         yield slice
 
 
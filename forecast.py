@@ -1,43 +1,59 @@
+import plotly.graph_objs as go
 import scrape
 
+from animation import publish_animation
+from artifacts import write_artifact
+from drift import update_drift
 from exceedance import get_exceedance_plot
 from extract import Area, process_nc
 from mapviz import plot_map
 from pathlib import Path
-from plot import load_json_fig, create_plots
-from pull import get_cds_forecast
+from plot import load_aemet_station_traces, load_aemet_traces, create_plots, export_views
+from pull import ForecastFile, get_cds_forecast
 from reference import stations
-from shutil import copy
+from registry import DatasetRegistry
 
 PATH = Path(__file__).parent
 
-def run_plot() -> None:
-    def copy_gif_out(
+def copy_gif_out(
         gif_path: Path,
         out_dir: Path = PATH / "out" / "dust_forecast.gif"
     ) -> None:
-        out_dir.parent.mkdir(parents=True, exist_ok=True)
-        copy(gif_path, out_dir)
+    write_artifact(out_dir, gif_path.read_bytes(), compress=False, hashed=True)
+    publish_animation(gif_path, out_dir.parent)
 
+
+def get_map_forecast(**opts) -> ForecastFile:
+    return get_cds_forecast(
+        out_dir=PATH / "data" / "CDS-map",
+        variable= ['dust'],
+        area=[39.33, 9.02, 30, 45],
+        **opts,
+    )
+
+
+def run_plot(registry: DatasetRegistry|None = None) -> go.Figure:
     aemet_paths = scrape.scrape()
     copy_gif_out(aemet_paths["gif"])
 
+    forecast = get_cds_forecast(registry=registry)
+    areas = list(process_nc(**forecast, slices=[Area(), stations], registry=registry))
+    update_drift(areas, forecast.date)
+
     return create_plots(
-        process_nc(**get_cds_forecast(), slices=[Area(), stations]),
-        [load_json_fig(aemet_paths["fig"]), get_exceedance_plot()],
+        areas,
+        [
+            load_aemet_traces(aemet_paths["fig"]) + load_aemet_station_traces(aemet_paths["points"]),
+            get_exceedance_plot(),
+        ],
     )
 
 
-def run_map() -> None:
-    return plot_map(
-        **get_cds_forecast(
-            out_dir=PATH / "data" / "CDS-map",
-            variable= ['dust'],
-            area=[39.33, 9.02, 30, 45],
-        )
-    )
+def run_map(registry: DatasetRegistry|None = None) -> None:
+    return plot_map(**get_map_forecast(registry=registry), registry=registry)
 
 
 if __name__ == "__main__":
-    run_plot()
-    run_map()
+    with DatasetRegistry() as registry:
+        export_views({"cyprus": run_plot(registry)})
+        run_map(registry)
@@ -1,31 +1,49 @@
 import holoviews as hv
-import pandas as pd
-import xarray as xr
 import hvplot.xarray
+import re
+import uuid
 
+from artifacts import write_artifact
 from cartopy import crs
-from datetime import date, datetime
+from datetime import date
 from pathlib import Path
+from registry import DatasetRegistry, localize, open_nc
+from tempfile import TemporaryDirectory
 
 
-def read_data(nc_file: Path):
-    return xr.open_dataset(nc_file).sel(level=0)
+# Bokeh names documents and elements with random UUIDs and models with a
+# process-wide "p<n>" counter
+BOKEH_ID = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|(?<=")p\d+(?=")')
 
 
-def format_date(data: pd.DataFrame, ref_date: date) -> pd.DatetimeIndex:
-    def fix_tz(timeseries: pd.Series) -> pd.DatetimeIndex:
-        return pd.DatetimeIndex(
-            pd.to_datetime(timeseries, utc=True)
-        ).tz_convert("Asia/Nicosia")
-    data.time = fix_tz(data.time + datetime.combine(ref_date, datetime.min.time()))
-    return data.time
+def stable_ids(html: str) -> str:
+    # Renumber ids by first appearance, so unchanged maps publish identical bytes
+    def stable_id(match: re.Match) -> str:
+        if match[0] not in ids:
+            n = len(ids) + 1
+            ids[match[0]] = f"p{1000 + n}" if match[0].startswith("p") else str(uuid.UUID(int=(0xa << 124) + n))
+        return ids[match[0]]
 
+    ids = {}
+    return BOKEH_ID.sub(stable_id, html)
 
-def plot_map(file: Path, date: date, out_file: Path = Path(__file__).parent / "out") -> None:
-    ds = read_data(file)
-    ds["time"] = format_date(ds.time.to_dataframe(), date)
+
+def read_data(nc_file: Path, registry: DatasetRegistry|None = None):
+    return (registry.open(nc_file) if registry else open_nc(nc_file)).sel(level=0)
+
+
+def plot_map(
+        file: Path,
+        date: date,
+        out_file: Path = Path(__file__).parent / "out",
+        registry: DatasetRegistry|None = None,
+    ) -> None:
+    ds = read_data(file, registry)
+    ds = ds.assign_coords(
+        time=registry.time(file, date) if registry else localize(ds.time.values, date)
+    )
     hv.output(widget_location="bottom")
-    hv.save(
+    plot = (
         ds.hvplot(
             x="longitude",
             y="latitude",
@@ -43,7 +61,13 @@ def plot_map(file: Path, date: date, out_file: Path = Path(__file__).parent / "o
             ylim=(4000000, 4100000),
             title="CAMS Dust Forecast",
             active_tools=["pan","wheel_zoom"],
-        ),
-        out_file / "dust-forecast-map.html"
+        )
     )
+    # hv.save only writes to disk, render into a scratch dir and publish from there
+    with TemporaryDirectory() as tmp:
+        hv.save(plot, Path(tmp) / "dust-forecast-map.html")
+        write_artifact(
+            out_file / "dust-forecast-map.html",
+            stable_ids((Path(tmp) / "dust-forecast-map.html").read_text()).encode(),
+        )
 
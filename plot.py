@@ -1,19 +1,84 @@
 import numpy as np
+import orjson
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objs as go
-import plotly.io as io
+import re
 
-from datetime import date, datetime
+from artifacts import write_artifact
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
 from extract import Area, Process
 from itertools import pairwise
+from multiprocessing import util
 from pathlib import Path
 from pull import Period
 from reference import species_name, quant_name, fig_defaults
 from typing import Iterator
 
 
-def make_traces(df: pd.DataFrame, fig: go.Figure, process: Process) -> dict:
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets over all traces (rows of y) at once,
+    # returns the kept indices per trace
+    rows = np.arange(y.shape[0])
+    if n_out >= x.size or n_out < 3:
+        return np.broadcast_to(np.arange(x.size), y.shape)
+
+    edges = np.linspace(1, x.size - 1, n_out - 1).astype(int)
+    idx = np.zeros((y.shape[0], n_out), dtype=int)
+    idx[:, -1] = x.size - 1
+
+    for b, (lo, hi) in enumerate(pairwise(edges)):
+        if b + 2 < edges.size:
+            avg_x = x[hi:edges[b + 2]].mean()
+            # nanmean without the warning for all-NaN buckets
+            bucket = y[:, hi:edges[b + 2]]
+            count = np.isfinite(bucket).sum(axis=1)
+            avg_y = np.where(count > 0, np.nansum(bucket, axis=1) / np.maximum(count, 1), np.nan)
+        else:
+            avg_x, avg_y = x[-1], y[:, -1]
+
+        ax, ay = x[idx[:, b]], y[rows, idx[:, b]]
+        area = np.abs(
+            (ax[:, None] - avg_x) * (y[:, lo:hi] - ay[:, None])
+            - (ax[:, None] - x[lo:hi]) * (avg_y[:, None] - ay[:, None])
+        )
+        idx[:, b + 1] = lo + np.where(np.isnan(area), -1, area).argmax(axis=1)
+
+    return idx
+
+
+def level_of_detail(
+        df: pd.DataFrame,
+        max_points: int = 1000,
+        shared: bool = False,
+    ) -> Iterator[tuple]:
+    x = (df.index.asi8 - df.index.asi8[0]) / 1e9
+    y = df.to_numpy(dtype=float).T
+    groups = df.columns.get_level_values(0)
+
+    if not shared:
+        idx = lttb(x, y, max_points)
+        for k, col in enumerate(df.columns):
+            yield col, pd.Series(y[k, idx[k]], index=df.index[idx[k]])
+        return
+
+    # Filled bands need one x axis per group: keep the union of each trace's
+    # points, with the per-trace budget split so the union stays under the cap
+    idx = lttb(x, y, max_points // groups.value_counts().max())
+    for group in groups.unique():
+        rows = np.flatnonzero(groups == group)
+        keep = np.unique(idx[rows])
+        for k in rows:
+            yield df.columns[k], pd.Series(y[k, keep], index=df.index[keep])
+
+
+def make_traces(
+        df: pd.DataFrame,
+        fig: go.Figure,
+        process: Process,
+        max_points: int = 1000,
+    ) -> dict:
     def get_colors(df: pd.DataFrame, level:int = 0) -> dict:
         return dict(
             zip(df.columns.levels[level].to_list(), px.colors.qualitative.D3)
@@ -58,7 +123,9 @@ def make_traces(df: pd.DataFrame, fig: go.Figure, process: Process) -> dict:
 
     trace_colors = get_colors(df, 0 if process == Process.QUANTILE else 1)
 
-    for species, sub in df.columns:
+    for (species, sub), series in level_of_detail(
+        df, max_points, shared=process == Process.QUANTILE
+    ):
         match process:
             case Process.QUANTILE:
                 options = quant_options()
@@ -69,8 +136,8 @@ def make_traces(df: pd.DataFrame, fig: go.Figure, process: Process) -> dict:
             **{
                 "uid": process.name,
                 "legendgroup": f"{process.name}.{species}",
-                "x": df.index,
-                "y": df[species][sub],
+                "x": series.index,
+                "y": series,
                 "mode": "lines",
                 "visible": True if "PM10" in species else "legendonly",
                 "legendgrouptitle": {
@@ -84,14 +151,41 @@ def make_traces(df: pd.DataFrame, fig: go.Figure, process: Process) -> dict:
     return fig
 
 
+CURRENT_TIME_MARKER = {
+    'type': 'line',
+    'xref': 'x',
+    'yref': 'paper',
+    'y0': 0,
+    'y1': 1,
+    'opacity': 0.07,
+    'line': {
+        'color': 'grey',
+        'width': 5,
+        'dash': 'dot',
+    }
+}
+
+
+def mark_current_time(div_id: str) -> str:
+    # Drawn by the browser, so the published page stays byte-identical between runs.
+    # The x axis holds naive Nicosia times, sv-SE formats as "YYYY-MM-DD HH:MM:SS"
+    return f"""
+        var now = new Date().toLocaleString("sv-SE", {{timeZone: "Asia/Nicosia"}});
+        var gd = document.getElementById("{div_id}");
+        Plotly.relayout(gd, {{
+            shapes: (gd.layout.shapes || []).concat([
+                Object.assign({{x0: now, x1: now}}, {orjson.dumps(CURRENT_TIME_MARKER).decode()})
+            ])
+        }});
+    """
+
+
 def publish(
         fig: go.Figure,
         datestamp: date,
         out_dir: Path = Path(__file__).parent.absolute() / "out"
     ) -> None:
-    out_dir.mkdir(parents=True, exist_ok=True)
-    fig.write_html(
-        out_dir / f"forecast.html",
+    html = fig.to_html(
         config={
             "scrollZoom": True,
             "toImageButtonOptions": {
@@ -100,7 +194,60 @@ def publish(
             "displaylogo": False
         },
         include_plotlyjs="cdn",
+        div_id="forecast",
+        post_script=mark_current_time("forecast"),
     )
+    write_artifact(out_dir / "forecast.html", html.encode())
+
+
+# Per-worker figures, set once by init_renderer
+WORKER_FIGS = {}
+
+
+def init_renderer(figs: dict[str, dict]) -> None:
+    # Only image export needs kaleido, importing plot for the report should not
+    import kaleido
+
+    WORKER_FIGS.update({name: go.Figure(fig) for name, fig in figs.items()})
+    # One browser per worker, reused by every to_image call until the worker exits.
+    # Pool workers leave through os._exit and skip atexit, multiprocessing finalizers still run
+    kaleido.start_sync_server(silence_warnings=True)
+    util.Finalize(None, kaleido.stop_sync_server, kwargs={"silence_warnings": True}, exitpriority=10)
+
+
+def render_view(name: str, index: int, fmt: str) -> tuple[str, str, bytes]:
+    fig = go.Figure(WORKER_FIGS[name])
+    button = fig.layout.updatemenus[0].buttons[index]
+    fig.plotly_update(restyle_data=button.args[0], relayout_data=button.args[1])
+    fig.update_layout(updatemenus=[])
+    label = re.sub(r"<[^>]+>", "", button.label).replace(" ", "-")
+    return f"{name}_{label}.{fmt}", fmt, fig.to_image(format=fmt, width=1600, height=900)
+
+
+def export_views(
+        figs: dict[str, go.Figure],
+        out_dir: Path = Path(__file__).parent.absolute() / "out" / "snapshots",
+        formats: list[str] = ["png"],
+        max_workers: int|None = None,
+    ) -> list[Path]:
+    jobs = [
+        (name, i, fmt)
+        for name, fig in figs.items()
+        for i in range(len(fig.layout.updatemenus[0].buttons))
+        for fmt in formats
+    ]
+
+    with ProcessPoolExecutor(
+        max_workers,
+        initializer=init_renderer,
+        initargs=({name: fig.to_dict() for name, fig in figs.items()},),
+    ) as pool:
+        images = list(pool.map(render_view, *zip(*jobs)))
+
+    for filename, fmt, image in images:
+        write_artifact(out_dir / filename, image, compress=fmt == "svg")
+
+    return [out_dir / filename for filename, *_ in images]
 
 
 def get_updates(views: dict) -> dict:
@@ -240,8 +387,88 @@ def get_updates(views: dict) -> dict:
     }
 
 
-def load_json_fig(fig_path: Path) -> go.Figure:
-    return io.read_json(fig_path)
+def read_fig_data(fig_path: Path) -> list[dict]:
+    with fig_path.open("rb") as f:
+        return orjson.loads(f.read())["data"]
+
+
+def load_aemet_traces(fig_path: Path) -> list[dict]:
+    def convert_time(x: list[str]) -> list[str]:
+        return pd.DatetimeIndex(
+            x,
+            tz="UTC"
+        ).tz_convert("Asia/Nicosia").strftime("%Y-%m-%dT%H:%M:00").to_list()
+
+    def shared_axis(x: list[str]) -> list[str]:
+        if (key := tuple(x)) not in axes:
+            axes[key] = convert_time(x)
+        return axes[key]
+
+    def make_trace(i: int, f: dict) -> dict:
+        return {
+            **f,
+            **({
+                "fill": "tozeroy",
+                "fillcolor": "rgba(0, 0, 0, 0.1)",
+            } if f.get("visible") == True else {}),
+            "uid": "AEMET",
+            "name": f["name"].split(" ")[0],
+            "line": dict(shape="spline", dash="solid", smoothing=0.7),
+            "legendgrouptitle": {
+                "text": " " if i == 0 else None,
+                "font": {"size": 14},
+            },
+            "x": shared_axis(f["x"]),
+        }
+
+    # Models share one time axis, convert it once
+    axes = {}
+    return [make_trace(i, f) for i, f in enumerate(read_fig_data(fig_path))]
+
+
+def load_aemet_table(fig_paths: dict[str, Path]) -> pd.DataFrame:
+    df = pd.concat(
+        [
+            pd.DataFrame({
+                "time": trace["x"],
+                "value": trace["y"],
+                "model": trace["name"].split(" ")[0],
+                "point": point,
+            })
+            for point, fig_path in fig_paths.items()
+            for trace in read_fig_data(fig_path)
+        ],
+        ignore_index=True,
+    )
+    # to_datetime caches repeated strings, so the shared axis is parsed once
+    df["time"] = pd.DatetimeIndex(
+        pd.to_datetime(df.time, utc=True, cache=True)
+    ).tz_convert("Asia/Nicosia")
+    return df.pivot(index="time", columns=["model", "point"], values="value")
+
+
+def load_aemet_station_traces(fig_paths: dict[str, Path], model: str = "median") -> list[dict]:
+    if not fig_paths:
+        return []
+
+    table = load_aemet_table(fig_paths)
+    x = table.index.strftime("%Y-%m-%dT%H:%M:00").to_list()
+    return [
+        {
+            "type": "scatter",
+            "uid": "AEMET",
+            "name": point,
+            "legendgroup": f"AEMET.{model}",
+            "legendgrouptitle": {"text": f"{model} (stations)", "font": {"size": 14}},
+            "x": x,
+            "y": series.to_list(),
+            "mode": "lines",
+            "visible": "legendonly",
+            "line": dict(shape="spline", smoothing=0.7, width=1),
+            "hovertemplate": f"<b>{point}</b><br>%{{y:.1f}} μg/m³",
+        }
+        for point, series in table[model].items()
+    ]
 
 
 def add_fig_group(fig: go.Figure, other: go.Figure, uuid: str = None) -> go.Figure:
@@ -274,7 +501,7 @@ def add_fig_group(fig: go.Figure, other: go.Figure, uuid: str = None) -> go.Figu
 def make_fig_collection(
         df: Area,
         fig: go.Figure,
-        more_figs: list[go.Figure],
+        more_figs: list[go.Figure|list[dict]],
     ) -> tuple[go.Figure, dict]:
 
     def make_views(views: list, sizes: list) -> dict:
@@ -296,26 +523,6 @@ def make_fig_collection(
             )
         }
 
-    def mark_current_time() -> list[dict]:
-        return [
-            {
-                'type': 'line',
-                'xref': 'x',
-                'yref': 'paper',
-                'x0': datetime.now(),
-                'y0': 0,
-                'x1': datetime.now(),
-                'y1': 1,
-                'opacity': 0.07,
-                'line': {
-                    'color': 'grey',
-                    'width': 5,
-                    'dash': 'dot',
-                }
-            }
-        ]
-
-
 
     sizes = [0]
     for tbl in df:
@@ -323,22 +530,25 @@ def make_fig_collection(
         sizes.append((len(fig.data)))
 
     for other_fig in more_figs:
-        fig = add_fig_group(
-            fig,
-            other_fig,
-            uuid="PROBS" if not other_fig.layout.title.text else None
-        )
+        if isinstance(other_fig, go.Figure):
+            fig = add_fig_group(
+                fig,
+                other_fig,
+                uuid="PROBS" if not other_fig.layout.title.text else None
+            )
+        else:
+            # Trace dicts are already styled, add them without per-property validation
+            fig.add_traces([go.Scatter(trace, _validate=False) for trace in other_fig])
         sizes.append((len(fig.data)))
 
     views = make_views([f.visible for f in fig.data], sizes)
-    [fig.add_shape(**shape) for shape in mark_current_time()]
 
     return fig, views
 
 
 def create_plots(
         df: Area|Iterator[Area],
-        more_figs: list[go.Figure],
+        more_figs: list[go.Figure|list[dict]],
         datestamp: date = Period().end_date
     ) -> go.Figure:
 
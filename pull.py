@@ -1,13 +1,18 @@
 import cdsapi
 import extract
+import logging
 import yaml
 
 from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import date
 from pathlib import Path
+from registry import DatasetRegistry
 from shutil import rmtree
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class Period:
@@ -56,10 +61,11 @@ def format_request(
             'ozone',
             'sulphur_dioxide',
         ],
-        area: list[float|int] = [36.54, 30.24, 33.63, 36.43]
+        area: list[float|int] = [36.54, 30.24, 33.63, 36.43],
+        model: str = 'ensemble',
     ) -> dict:
     return {
-        'model': 'ensemble',
+        'model': model,
         'format': 'netcdf',
         'type': 'forecast',
         'level': '0',
@@ -86,12 +92,21 @@ def make_request(
         out_file: Path,
         dry_run: bool = False,
         hours: int = 97,
+        registry: DatasetRegistry|None = None,
     ) -> None:
-    if not dry_run and not extract.file_complete(out_file, hours):
+    if not dry_run and not extract.file_complete(out_file, hours, registry):
+        if registry:
+            # Release the handle on the incomplete file before it is overwritten
+            registry.evict(out_file.resolve())
         client.retrieve(dataset, request_obj, out_file)
 
 
-def get_latest_complete(dates: Period, out_file: Path, hours: int = 97) -> ForecastFile:
+def get_latest_complete(
+        dates: Period,
+        out_file: Path,
+        hours: int = 97,
+        registry: DatasetRegistry|None = None,
+    ) -> ForecastFile:
     def get_previous_available(dir_path: Path) -> ForecastFile:
          # Always gives previous available, even if considered incomplete
         return (
@@ -104,7 +119,7 @@ def get_latest_complete(dates: Period, out_file: Path, hours: int = 97) -> Forec
         )
     return (
         ForecastFile(file=out_file, date=dates.end_date)
-        if extract.file_complete(out_file, hours) else 
+        if extract.file_complete(out_file, hours, registry) else 
         get_previous_available(out_file.parent)
     )
 
@@ -129,6 +144,7 @@ def get_cds_forecast(
         dataset: str = 'cams-europe-air-quality-forecasts',
         out_dir: Path = Path(__file__).parent / 'data' / 'CDS',
         hours: int = 97,
+        registry: DatasetRegistry|None = None,
         **opts,
     ) -> ForecastFile:
 
@@ -137,14 +153,38 @@ def get_cds_forecast(
     request_obj = format_request(dates, hours=hours, **opts)
     out_file = set_filename(out_dir, dates)
 
-    make_request(cds, dataset, request_obj, out_file, dry_run=False, hours=hours)
-    latest_forecast = get_latest_complete(dates, out_file, hours)
+    make_request(cds, dataset, request_obj, out_file, dry_run=False, hours=hours, registry=registry)
+    latest_forecast = get_latest_complete(dates, out_file, hours, registry)
 
     cleanup_downloads(out_dir)
 
     return latest_forecast
 
 
+def get_cds_models(
+        models: list[str] = ['chimere', 'emep', 'lotos', 'match', 'mocage', 'silam'],
+        dates: Period = Period(),
+        out_dir: Path = Path(__file__).parent / 'data' / 'CDS-models',
+        max_workers: int = 4,
+        **opts,
+    ) -> dict[str, ForecastFile]:
+    # Each model keeps its own download dir, so cache hits and cleanup are per model
+    with ThreadPoolExecutor(max_workers) as pool:
+        futures = {
+            model: pool.submit(get_cds_forecast, dates, out_dir=out_dir / model, model=model, **opts)
+            for model in models
+        }
+
+    forecasts = {}
+    for model, future in futures.items():
+        try:
+            forecasts[model] = future.result()
+        except Exception:
+            # One missing member should not cost the rest of the ensemble
+            logger.exception(f"Retrieving CAMS model {model} failed")
+    return forecasts
+
+
 if __name__ == "__main__":
     # Forecast availability:
     # D0 (00-24h) 05:50 UTC guaranteed by 08:00 UTC
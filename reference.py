@@ -12,6 +12,15 @@ stations = Area.combine(
     Area("AYMBGR", lon=33.05777, lat=35.03805),
 )
 
+aemet_points = {
+    name: [lat, lon]
+    for name, lat, lon in zip(
+        stations.name.values(),
+        stations.lat.values.tolist(),
+        stations.lon.values.tolist(),
+    )
+}
+
 quant_name = {0: 'min', 0.25: 'Q₁', 0.5: 'x̃', 0.75: 'Q₃', 1: 'max'}
 
 species_name = {
@@ -0,0 +1,57 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+
+
+def open_nc(nc_file: Path) -> xr.Dataset:
+    # CAMS stores lead time in hours, decode it to timedelta explicitly
+    return xr.open_dataset(nc_file, decode_timedelta=True)
+
+
+def localize(time: np.ndarray|pd.Series, ref_date: date) -> pd.DatetimeIndex:
+    if np.asarray(time).dtype.kind != "m":
+        raise TypeError(f"Expected a timedelta lead time axis, got {np.asarray(time).dtype}")
+    return pd.DatetimeIndex(
+        pd.to_datetime(pd.to_timedelta(time) + pd.Timestamp(ref_date), utc=True)
+    ).tz_convert("Asia/Nicosia")
+
+
+@dataclass
+class DatasetRegistry:
+    datasets: dict[Path, tuple[int, xr.Dataset]] = field(default_factory=dict)
+    times: dict[tuple, pd.DatetimeIndex] = field(default_factory=dict)
+
+    def evict(self, path: Path) -> None:
+        if path in self.datasets:
+            self.datasets.pop(path)[1].close()
+        self.times = {k: v for k, v in self.times.items() if k[0] != path}
+
+    def open(self, file: Path) -> xr.Dataset:
+        # Lazy, so point reads and completeness checks only touch what they index
+        [self.evict(p) for p in list(self.datasets) if not p.exists()]
+        path, mtime = file.resolve(), file.stat().st_mtime_ns
+        if self.datasets.get(path, (None,))[0] != mtime:
+            # A re-downloaded file replaces its stale handle
+            self.evict(path)
+            self.datasets[path] = (mtime, open_nc(path))
+        return self.datasets[path][1]
+
+    def time(self, file: Path, ref_date: date) -> pd.DatetimeIndex:
+        data = self.open(file)
+        if (key := (file.resolve(), ref_date)) not in self.times:
+            self.times[key] = localize(data.time.values, ref_date)
+        return self.times[key]
+
+    def close(self) -> None:
+        [self.evict(p) for p in list(self.datasets)]
+
+    def __enter__(self) -> DatasetRegistry:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,3 +1,4 @@
+import gevent
 import grequests
 import json
 import requests
@@ -6,7 +7,9 @@ from datetime import date, timedelta
 from itertools import cycle, product
 from pathlib import Path
 from pull import cleanup_downloads
+from reference import aemet_points
 from shutil import copyfileobj
+from time import monotonic
 from typing import Iterator
 
 
@@ -38,13 +41,64 @@ def get_probability_maps(
     responses = grequests.map(urls)
 
     for rs, level in zip(responses, cycle(levels)):
-        if rs.status_code == 200:
+        if rs is not None and rs.status_code == 200:
             write_geojson(rs, level)
             yield True
         else:
             yield False
 
 
+def write_json(file: Path, payload: str) -> Path:
+    file.parent.mkdir(parents=True, exist_ok=True)
+    with file.open("w") as f:
+        f.write(json.dumps(payload))
+    return file
+
+
+def format_payload(template_request: Path, day: str, lat_lon: list[float]) -> dict:
+    with template_request.open('r') as f:
+        payload = json.loads(f.read())
+
+    payload["state"][1]["value"] = day
+    payload["state"][3]["value"]["median"] = lat_lon
+    return payload
+
+
+def get_figure(response: requests.Response) -> dict:
+    return (
+        response
+            .json()
+            .get('response')
+            .get('ts-modal')
+            .get('children')
+            .get('props')
+            .get('children')
+            .get('props')
+            .get('figure')
+    )
+
+
+def map_throttled(
+        requests: list[grequests.AsyncRequest],
+        size: int,
+        min_interval: float,
+    ) -> list[requests.Response|None]:
+
+    def send(request: grequests.AsyncRequest) -> None:
+        nonlocal next_start
+        # Greenlets start in order, so each one reserves the next free start slot
+        start = max(monotonic(), next_start)
+        next_start = start + min_interval
+        gevent.sleep(start - monotonic())
+        request.send()
+
+    next_start = monotonic()
+    # Pool size caps the requests in flight, the interval spaces out their starts
+    pool = grequests.Pool(size)
+    gevent.joinall([pool.spawn(send, r) for r in requests])
+    return [r.response for r in requests]
+
+
 def get_timeseries_plot(
         root: str = "https://dust.aemet.es/daily_dashboard",
         api_path: str = "_dash-update-component",
@@ -55,39 +109,52 @@ def get_timeseries_plot(
         out_path: Path = Path(__file__).parent / "data/AEMET",
     ) -> Path|str|None:
 
-    def write_json(file: Path, payload: str) -> Path:
-        file.parent.mkdir(parents=True, exist_ok=True)
-        with file.open("w") as f:
-            f.write(json.dumps(payload))
-        return file
-
     if (file := out_path / day / f"{day}_fig.json").exists():
         return file 
 
-    with template_request.open('r') as f:
-        payload = json.loads(f.read())
-
-    payload["state"][1]["value"] = day
-    payload["state"][3]["value"]["median"] = lat_lon
-
+    payload = format_payload(template_request, day, lat_lon)
     response = requests.post(f"{root}/{api_path}", json=payload)
 
     if response.status_code == 200:
-        fig_payload = (
-            response
-                .json()
-                .get('response')
-                .get('ts-modal')
-                .get('children')
-                .get('props')
-                .get('children')
-                .get('props')
-                .get('figure')
-        )
-        file = write_json(file, fig_payload)
+        file = write_json(file, get_figure(response))
         return file
 
 
+def get_timeseries_plots(
+        points: dict[str, list[float]] = aemet_points,
+        root: str = "https://dust.aemet.es/daily_dashboard",
+        api_path: str = "_dash-update-component",
+        template_request: Path = Path(__file__).parent.absolute() \
+            / "data/ref/fig-template-payload.json",
+        day: str = f'{date.today() - timedelta(days=1):%Y%m%d}',
+        out_path: Path = Path(__file__).parent / "data/AEMET",
+        max_concurrent: int = 3,
+        min_interval: float = 0.5,
+    ) -> dict[str, Path]:
+
+    files = {
+        name: out_path / day / f"{day}_{name}_fig.json"
+        for name in points
+    }
+    missing = [name for name, file in files.items() if not file.exists()]
+
+    urls = [
+        grequests.post(
+            f"{root}/{api_path}",
+            json=format_payload(template_request, day, points[name])
+        )
+        for name in missing
+    ]
+
+    responses = map_throttled(urls, max_concurrent, min_interval)
+
+    for name, rs in zip(missing, responses):
+        if rs is not None and rs.status_code == 200:
+            write_json(files[name], get_figure(rs))
+
+    return {name: file for name, file in files.items() if file.exists()}
+
+
 def get_map_gif(
         url: str = "https://dust.aemet.es/daily_dashboard/assets/comparison/median/sconc_dust",
         day: date = date.today() - timedelta(days=1),
@@ -108,12 +175,13 @@ def get_map_gif(
         return out_file
 
 
-def scrape() -> dict[str, Path|str|None]:
-    fig_file = get_timeseries_plot()
-    list(get_probability_maps())
-    gif_file = get_map_gif()
+def scrape(day: date = date.today() - timedelta(days=1)) -> dict[str, Path|str|None]:
+    fig_file = get_timeseries_plot(day=f"{day:%Y%m%d}")
+    point_files = get_timeseries_plots(day=f"{day:%Y%m%d}")
+    list(get_probability_maps(day=f"{day:%Y%m%d}"))
+    gif_file = get_map_gif(day=day)
     cleanup_downloads(Path(__file__).parent / "data/AEMET", dirmode=True)
-    return {"fig": fig_file, "gif": gif_file}
+    return {"fig": fig_file, "points": point_files, "gif": gif_file}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+import json
+import logging
+import pandas as pd
+import plotly.graph_objs as go
+
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime
+from exceedance import get_probability_df, read_files
+from extract import Area, file_complete, process_nc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from plot import load_aemet_traces, make_traces
+from pull import get_sorted_dir
+from reference import stations
+from registry import DatasetRegistry
+from threading import Lock
+from time import monotonic
+from urllib.parse import unquote, urlparse
+
+PATH = Path(__file__).parent
+CATALOG_DIRS = [PATH / "data" / "CDS", PATH / "data" / "AEMET"]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Forecast:
+    catalog: tuple
+    areas: dict[str, Area] = field(default_factory=dict)
+    aemet: list[dict] = field(default_factory=list)
+    exceedance: pd.DataFrame = field(default_factory=pd.DataFrame)
+    responses: dict[str, tuple[str, bytes]] = field(default_factory=dict)
+
+
+def get_catalog(dirs: list[Path] = CATALOG_DIRS) -> tuple:
+    return tuple(sorted(
+        (str(f), f.stat().st_mtime_ns)
+        for d in dirs if d.exists()
+        for f in d.rglob("*") if f.is_file()
+    ))
+
+
+def load_forecast(catalog: tuple, data_path: Path = PATH / "data") -> Forecast:
+    forecast = Forecast(catalog=catalog)
+
+    with DatasetRegistry() as registry:
+        # Newest download that is complete, skipping partial or still-downloading files
+        cds_file = next(
+            (
+                f for f in get_sorted_dir(data_path / "CDS")
+                if f.suffix == ".nc" and file_complete(f, registry=registry)
+            ),
+            None,
+        )
+        if cds_file:
+            forecast.areas = dict(zip(
+                ["cyprus", "stations"],
+                process_nc(
+                    cds_file,
+                    date.fromisoformat(cds_file.stem.split("_")[1]),
+                    # process_nc fills in slice data, keep each snapshot's stations its own
+                    slices=[Area(), replace(stations)],
+                    registry=registry,
+                )
+            ))
+
+    if days := sorted(d for d in (data_path / "AEMET").glob("*") if d.is_dir()):
+        day = days[-1]
+        if (fig_file := day / f"{day.name}_fig.json").exists():
+            forecast.aemet = load_aemet_traces(fig_file)
+        if tbls := read_files(data_path / "AEMET", datetime.strptime(day.name, "%Y%m%d")):
+            forecast.exceedance = get_probability_df(tbls)
+
+    return forecast
+
+
+class ForecastCache:
+    def __init__(self, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self.checked = 0.0
+        self.loading = False
+        self.forecast = None
+        self.lock = Lock()
+
+    def get(self) -> Forecast|None:
+        with self.lock:
+            forecast = self.forecast
+            if self.loading or monotonic() - self.checked <= self.check_interval:
+                return forecast
+            # One thread reloads, the others keep serving the current snapshot meanwhile
+            self.checked = monotonic()
+            self.loading = True
+
+        try:
+            catalog = get_catalog()
+            if forecast is None or forecast.catalog != catalog:
+                forecast = load_forecast(catalog)
+        except Exception:
+            # Keep serving the previous forecast, retry on the next check
+            logger.exception("Reloading forecast failed")
+        finally:
+            with self.lock:
+                self.forecast, self.loading = forecast, False
+        return forecast
+
+
+def render(forecast: Forecast, path: str) -> tuple[str, bytes]:
+    match [unquote(p) for p in path.strip("/").split("/")]:
+        case ["catalog"]:
+            body = json.dumps({
+                "areas": {
+                    name: area.data.columns.levels[0].to_list()
+                    for name, area in forecast.areas.items()
+                },
+                "files": [name for name, _ in forecast.catalog],
+            })
+        case ["aemet"]:
+            body = go.Figure(data=forecast.aemet).to_json()
+        case ["exceedance"]:
+            body = forecast.exceedance.to_json(orient="records", date_format="iso")
+        case [area, species]:
+            body = forecast.areas[area].data[species].to_json(orient="split", date_format="iso")
+        case [area, species, "figure"]:
+            body = make_traces(
+                forecast.areas[area].data.loc[:, [species]],
+                go.Figure(),
+                forecast.areas[area].process,
+            ).to_json()
+        case ["stations", species, station]:
+            body = forecast.areas["stations"].data[species][station].to_json(orient="split", date_format="iso")
+        case _:
+            raise KeyError(path)
+    return "application/json", body.encode()
+
+
+def make_handler(cache: ForecastCache) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if (forecast := cache.get()) is None:
+                self.send_error(503)
+                return
+            path = urlparse(self.path).path
+            try:
+                if path not in forecast.responses:
+                    forecast.responses[path] = render(forecast, path)
+                content_type, body = forecast.responses[path]
+            except KeyError:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8050, check_interval: float = 5.0) -> None:
+    cache = ForecastCache(check_interval)
+    cache.get()
+    with ThreadingHTTPServer((host, port), make_handler(cache)) as server:
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve()
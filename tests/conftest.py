@@ -0,0 +1,91 @@
+import json
+import multiprocessing as mp
+import pytest
+
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import monotonic
+
+
+def make_figure(lat_lon: list[float]) -> dict:
+    return {
+        "data": [
+            {
+                "name": f"{model} (SCONC_DUST)",
+                "x": ["2022-05-29 12:00:00", "2022-05-29 15:00:00", "2022-05-29 18:00:00"],
+                "y": [lat_lon[0] + i, lat_lon[1] + i, float(i)],
+                "visible": i == 0 or "legendonly",
+                "type": "scatter",
+            }
+            for i, model in enumerate(["median", "monarch", "silam"])
+        ],
+        "layout": {},
+    }
+
+
+class DashboardStub(BaseHTTPRequestHandler):
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.log.open("a") as f:
+            f.write(json.dumps({"time": monotonic(), "payload": payload}) + "\n")
+        body = json.dumps({
+            "response": {
+                "ts-modal": {
+                    "children": {
+                        "props": {
+                            "children": {
+                                "props": {
+                                    "figure": make_figure(payload["state"][3]["value"]["median"])
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_stub(log: Path, port: mp.Queue) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DashboardStub)
+    server.log = log
+    port.put(server.server_port)
+    server.serve_forever()
+
+
+@dataclass
+class Dashboard:
+    server_port: int
+    log: Path
+
+    @property
+    def log_entries(self) -> list[dict]:
+        return [json.loads(line) for line in self.log.read_text().splitlines()] if self.log.exists() else []
+
+    @property
+    def requests(self) -> list[dict]:
+        return [entry["payload"] for entry in self.log_entries]
+
+    @property
+    def times(self) -> list[float]:
+        return sorted(entry["time"] for entry in self.log_entries)
+
+
+@pytest.fixture
+def dashboard(tmp_path):
+    # grequests monkey-patches sockets for gevent, so the stub runs in its own process
+    ctx = mp.get_context("spawn")
+    port = ctx.Queue()
+    stub = ctx.Process(target=run_stub, args=(tmp_path / "requests.jsonl", port), daemon=True)
+    stub.start()
+    yield Dashboard(server_port=port.get(timeout=30), log=tmp_path / "requests.jsonl")
+    stub.terminate()
+    stub.join()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from plot import load_aemet_station_traces, load_aemet_table
+from scrape import get_timeseries_plots
+
+POINTS = {
+    "LARTRA": [34.91666, 33.62750],
+    "NICTRA": [35.15194, 33.34777],
+    "PAFTRA": [34.77527, 32.42194],
+}
+
+
+def fetch(dashboard, tmp_path, min_interval=0.0):
+    return get_timeseries_plots(
+        points=POINTS,
+        root=f"http://127.0.0.1:{dashboard.server_port}",
+        day="20220529",
+        out_path=tmp_path / "AEMET",
+        max_concurrent=2,
+        min_interval=min_interval,
+    )
+
+
+def test_get_timeseries_plots_caches_per_point(dashboard, tmp_path):
+    files = fetch(dashboard, tmp_path)
+
+    assert set(files) == set(POINTS)
+    assert all(f == tmp_path / "AEMET" / "20220529" / f"20220529_{name}_fig.json" for name, f in files.items())
+    assert sorted(r["state"][3]["value"]["median"] for r in dashboard.requests) == sorted(POINTS.values())
+    assert all(r["state"][1]["value"] == "20220529" for r in dashboard.requests)
+
+    assert fetch(dashboard, tmp_path) == files
+    assert len(dashboard.requests) == len(POINTS)
+
+
+def test_load_aemet_table(dashboard, tmp_path):
+    table = load_aemet_table(fetch(dashboard, tmp_path))
+
+    assert table.shape == (3, 9)
+    assert table.columns.names == ["model", "point"]
+    assert str(table.index.tz) == "Asia/Nicosia"
+    assert table.index[0] == pd.Timestamp("2022-05-29 15:00", tz="Asia/Nicosia")
+    assert table["median"]["LARTRA"].iloc[0] == POINTS["LARTRA"][0]
+
+
+def test_get_timeseries_plots_spaces_requests(dashboard, tmp_path):
+    fetch(dashboard, tmp_path, min_interval=0.2)
+
+    assert len(dashboard.times) == len(POINTS)
+    # Arrival times on the stub carry some jitter over the send times
+    assert (np.diff(dashboard.times) > 0.15).all()
+
+
+def test_load_aemet_station_traces(dashboard, tmp_path):
+    traces = load_aemet_station_traces(fetch(dashboard, tmp_path))
+
+    assert [t["name"] for t in traces] == sorted(POINTS)
+    assert all(t["uid"] == "AEMET" and t["visible"] == "legendonly" for t in traces)
+    assert traces[0]["x"][0] == "2022-05-29T15:00:00"
+    assert load_aemet_station_traces({}) == []
@@ -0,0 +1,174 @@
+import logging
+import scrape
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from drift import update_drift
+from exceedance import get_exceedance_plot
+from extract import Area, process_nc
+from forecast import copy_gif_out, get_map_forecast
+from mapviz import plot_map
+from pathlib import Path
+from plot import load_aemet_station_traces, load_aemet_traces, create_plots
+from pull import Period, get_cds_forecast
+from reference import stations
+from registry import DatasetRegistry
+from time import sleep
+
+PATH = Path(__file__).parent
+
+logger = logging.getLogger(__name__)
+
+# CAMS availability (UTC), see pull.py: D0/D1 from 05:50, D2 07:30, D3 08:00,
+# all guaranteed by 10:00
+CAMS_WINDOWS = [time(5, 50), time(5, 55), time(7, 30), time(8, 0), time(10, 0)]
+# AEMET dashboard carries the previous day's run from the early morning
+AEMET_WINDOWS = [time(3, 0), time(6, 0)]
+
+
+@dataclass
+class Source:
+    windows: list[time]
+    interval: timedelta = timedelta(minutes=5)
+    max_interval: timedelta = timedelta(hours=1)
+    done: date|None = None
+    next: datetime|None = None
+
+    def at(self, day: date, t: time) -> datetime:
+        return datetime.combine(day, t, tzinfo=timezone.utc)
+
+    def start(self, now: datetime) -> datetime:
+        # Nothing is published before the first window, later starts poll right away
+        return max(now, self.at(now.date(), self.windows[0]))
+
+    def schedule(self, now: datetime) -> datetime:
+        if self.done == now.date():
+            return self.at(now.date() + timedelta(days=1), self.windows[0])
+        if now < (first := self.at(now.date(), self.windows[0])):
+            return first
+        # Retries back off from the last window that passed, each window polls on time
+        windows = [self.at(now.date(), t) for t in self.windows]
+        since = now - max(w for w in windows if w <= now)
+        backoff = min(max(since, self.interval), self.max_interval)
+        return min([now + backoff, *(w for w in windows if w > now)])
+
+
+def fingerprint(*paths: Path|None) -> tuple:
+    return tuple(
+        (str(p), p.stat().st_size, p.stat().st_mtime_ns)
+        for p in paths if p is not None and p.exists()
+    )
+
+
+def poll_cams(today: date, state: dict) -> set[str]:
+    # Fresh per poll, so old runs' datasets are not kept open by the daemon
+    with DatasetRegistry() as registry:
+        return update_cams(today, state, registry)
+
+
+def update_cams(today: date, state: dict, registry: DatasetRegistry) -> set[str]:
+    changed = set()
+
+    forecast = get_cds_forecast(Period(today, today), registry=registry)
+    if (fp := fingerprint(forecast.file)) != state.get("cams"):
+        state["areas"] = list(process_nc(**forecast, slices=[Area(), stations], registry=registry))
+        update_drift(state["areas"], forecast.date)
+        state["cams"] = fp
+        changed.add("plot")
+
+    # The map comes from the same CAMS release, skip its retrieve until that has landed
+    if forecast.date != today and "cams-map" in state:
+        state["cams-done"] = False
+        return changed
+
+    map_forecast = get_map_forecast(dates=Period(today, today), registry=registry)
+    if (fp := fingerprint(map_forecast.file)) != state.get("cams-map"):
+        plot_map(**map_forecast, registry=registry)
+        state["cams-map"] = fp
+        changed.add("map")
+
+    state["cams-done"] = forecast.date == today and map_forecast.date == today
+    return changed
+
+
+def poll_aemet(today: date, state: dict) -> set[str]:
+    changed = set()
+    day = today - timedelta(days=1)
+
+    paths = scrape.scrape(day)
+    geojsons = sorted((PATH / "data/AEMET" / f"{day:%Y%m%d}").glob("*.geojson"))
+
+    if paths["fig"] and (fp := fingerprint(paths["fig"], *paths["points"].values())) != state.get("aemet"):
+        state["traces"] = load_aemet_traces(paths["fig"]) + load_aemet_station_traces(paths["points"])
+        state["aemet"] = fp
+        changed.add("plot")
+
+    if geojsons and (fp := fingerprint(*geojsons)) != state.get("probs"):
+        state["probs-fig"] = get_exceedance_plot(day)
+        state["probs"] = fp
+        changed.add("plot")
+
+    if paths["gif"] and (fp := fingerprint(paths["gif"])) != state.get("gif"):
+        copy_gif_out(paths["gif"])
+        state["gif"] = fp
+        changed.add("gif")
+
+    state["aemet-done"] = bool(paths["fig"] and paths["gif"] and geojsons)
+    return changed
+
+
+def rebuild_report(state: dict, datestamp: date) -> bool:
+    # Views whose inputs did not change are reused from the last poll
+    if not (state.get("plot-dirty") and {"areas", "traces", "probs-fig"} <= state.keys()):
+        return True
+    try:
+        create_plots(
+            state["areas"],
+            [state["traces"], state["probs-fig"]],
+            datestamp=datestamp,
+        )
+    except Exception:
+        logger.exception("Rebuilding the report failed")
+        return False
+    state["plot-dirty"] = False
+    return True
+
+
+def watch(interval: timedelta = timedelta(minutes=5)) -> None:
+    now = datetime.now(timezone.utc)
+    cams = Source(CAMS_WINDOWS, interval)
+    aemet = Source(AEMET_WINDOWS, interval)
+    cams.next, aemet.next = cams.start(now), aemet.start(now)
+    state = {}
+
+    while True:
+        now = datetime.now(timezone.utc)
+
+        for name, source, poll in [
+            ("cams", cams, lambda: poll_cams(now.date(), state)),
+            ("aemet", aemet, lambda: poll_aemet(now.date(), state)),
+        ]:
+            if now < source.next:
+                continue
+            try:
+                # Inputs stay dirty until the report has been rebuilt from them
+                if "plot" in poll():
+                    state["plot-dirty"] = True
+            except Exception:
+                # Unpublished data and network errors are expected before release, retry later
+                logger.exception(f"Polling {name} failed")
+                state[f"{name}-done"] = False
+            source.done = now.date() if state[f"{name}-done"] else None
+            source.next = source.schedule(now)
+
+        # A failed rebuild is retried after an interval, even once both sources are done
+        retry = [] if rebuild_report(state, now.date()) else [now + interval]
+        sleep(max(
+            (min(cams.next, aemet.next, *retry) - datetime.now(timezone.utc)).total_seconds(),
+            1,
+        ))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    watch()